@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Non-blocking TCP connect probes shared by the ESP32 diagnostic scripts
+(find_esp32_port.py and test_connection.py)
+"""
+import errno
+import selectors
+import socket
+import time
+
+# connect_ex() results meaning "handshake still in progress" on a non-blocking socket
+# (Windows reports WSAEWOULDBLOCK, which Python maps to errno.EWOULDBLOCK)
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+def _start_connect(host, port):
+    """
+    Open a non-blocking socket and start connecting it
+    
+    Returns:
+        tuple: (socket, connect_ex() result); the socket is closed if this raises
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        return sock, sock.connect_ex((host, port))
+    except BaseException:
+        sock.close()
+        raise
+
+def _connect_result(sock):
+    """Result of a finished handshake (the socket selected writable)"""
+    # Writable means the handshake finished; SO_ERROR holds the real result
+    return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+
+def connect_nonblocking(host, port, timeout):
+    """
+    Non-blocking TCP connect that waits on a selector instead of settimeout()
+    
+    Returns:
+        int: 0 if connected, otherwise the socket error code
+             (errno.ETIMEDOUT if the handshake didn't finish within timeout)
+    """
+    sock, err = _start_connect(host, port)
+    try:
+        if err not in CONNECT_IN_PROGRESS:
+            return err
+        with selectors.DefaultSelector() as sel:
+            sel.register(sock, selectors.EVENT_WRITE)
+            if not sel.select(timeout):
+                return errno.ETIMEDOUT
+        return _connect_result(sock)
+    finally:
+        sock.close()
+
+def probe_ports(host, ports, timeout=2):
+    """
+    Probe several ports at once with non-blocking connects on one selector
+    
+    Yields (port, is_open) in the order the ports answer; ports that haven't
+    answered within timeout are yielded last as closed. Stop iterating early
+    to abandon the remaining probes (their sockets are closed).
+    """
+    sel = selectors.DefaultSelector()
+    pending = {}
+    try:
+        for port in ports:
+            try:
+                sock, err = _start_connect(host, port)
+            except OSError:
+                # e.g. gaierror for an unresolvable hostname
+                yield port, False
+                continue
+            if err in CONNECT_IN_PROGRESS:
+                sel.register(sock, selectors.EVENT_WRITE, port)
+                pending[port] = sock
+            else:
+                sock.close()
+                yield port, err == 0
+        
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(remaining):
+                port = key.data
+                sock = pending.pop(port)
+                err = _connect_result(sock)
+                sel.unregister(sock)
+                sock.close()
+                yield port, err == 0
+        
+        for port in list(pending):
+            yield port, False
+    finally:
+        for sock in pending.values():
+            sock.close()
+        sel.close()
@@ -4,19 +4,19 @@
 Script to find which port the ESP32 is listening on
 Tries both 8000 (new JSON protocol) and 8080 (old binary protocol)
 """
-import socket
 import sys
 
+try:
+    from client.connect_probe import probe_ports
+except ImportError:
+    # Running as a script from inside client/
+    from connect_probe import probe_ports
+
 def test_port(host, port, timeout=2):
     """Test if a port is open"""
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        result = sock.connect_ex((host, port))
-        sock.close()
-        return result == 0
-    except:
-        return False
+    for _, is_open in probe_ports(host, [port], timeout):
+        return is_open
+    return False
 
 def main():
     host = "192.168.4.1"
@@ -29,14 +29,15 @@ def main():
     print()
     
     found_port = None
-    for port in ports_to_test:
-        print(f"Testing port {port}...", end=" ")
-        if test_port(host, port):
+    # Probe all ports at once so a closed port doesn't stall the others
+    print(f"Testing ports {', '.join(str(p) for p in ports_to_test)}...")
+    for port, is_open in probe_ports(host, ports_to_test, timeout=2):
+        if is_open:
             print(f"[OK] Port {port} is OPEN")
             found_port = port
             break
         else:
-            print(f"[CLOSED]")
+            print(f"[CLOSED] Port {port}")
     
     print()
     print("="*60)
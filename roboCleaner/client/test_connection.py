@@ -4,9 +4,15 @@
 Diagnostic script to test ESP32 connection
 Checks WiFi connectivity, IP reachability, and port availability
 """
+import asyncio
+import ctypes
+import errno
+import os
+import selectors
 import socket
-import subprocess
+import struct
 import sys
+import time
 import platform
 import io
 
@@ -15,19 +21,219 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+# Optional io_uring backend for batched connect probes (Linux only, pip install liburing)
+try:
+    import liburing
+    _HAS_LIBURING = sys.platform.startswith('linux')
+except Exception:
+    liburing = None
+    _HAS_LIBURING = False
+
+# Connect error codes (POSIX errno and their Windows WSA equivalents)
+_CONNECTION_REFUSED = (errno.ECONNREFUSED, 10061)
+_CONNECTION_TIMED_OUT = (errno.ETIMEDOUT, 10060)
+
+try:
+    from client.connect_probe import connect_nonblocking
+except ImportError:
+    # Running as a script from inside client/
+    from connect_probe import connect_nonblocking
+
+async def connect_async(host, port, timeout):
+    """
+    asyncio counterpart of connect_nonblocking, for running probes side by side
+    
+    Returns:
+        int: 0 if connected, otherwise the socket error code
+             (errno.ETIMEDOUT if the handshake didn't finish within timeout)
+    """
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+        return 0
+    except asyncio.TimeoutError:
+        return errno.ETIMEDOUT
+    except socket.gaierror:
+        raise
+    except OSError as e:
+        if e.errno is None:
+            raise
+        return e.errno
+    finally:
+        sock.close()
+
+def connect_many_uring(targets):
+    """
+    Run several connect probes with a single io_uring submission
+    
+    Each IORING_OP_CONNECT is linked to an IORING_OP_LINK_TIMEOUT, so one
+    io_uring_submit_and_wait() call starts every probe and reaps every result.
+    
+    Args:
+        targets: List of (host, port, timeout) tuples
+    
+    Returns:
+        list: Result per target, same codes as connect_nonblocking
+    
+    Raises:
+        socket.gaierror: If a host can't be resolved (before any ring is set up)
+        OSError: If io_uring is unavailable (old kernel, disabled by policy, ...)
+    """
+    addrs = [socket.gethostbyname(host) for host, _, _ in targets]
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    liburing.io_uring_queue_init(2 * len(targets), ring)
+    socks = []
+    try:
+        sqes = liburing.Sqe(2 * len(targets))
+        # Keep addresses and timespecs alive until the kernel has consumed them
+        keep_alive = []
+        for i, ((_, port, timeout), ip) in enumerate(zip(targets, addrs)):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            socks.append(sock)
+            addr = liburing.Sockaddr(socket.AF_INET, ip, port)
+            ts = liburing.timespec(timeout)
+            keep_alive.extend([addr, ts])
+            
+            liburing.io_uring_prep_connect(sqes[2 * i], sock.fileno(), addr)
+            sqes[2 * i].flags |= liburing.IOSQE_IO_LINK
+            sqes[2 * i].user_data = i
+            liburing.io_uring_prep_link_timeout(sqes[2 * i + 1], ts, 0)
+            sqes[2 * i + 1].user_data = len(targets)  # timeout completions are ignored
+        if not liburing.put_sqe(ring, sqes):
+            raise OSError(errno.EBUSY, "io_uring submission queue is full")
+        
+        pending = 2 * len(targets)
+        liburing.io_uring_submit_and_wait(ring, pending)
+        results = [errno.ETIMEDOUT] * len(targets)
+        while pending:
+            liburing.io_uring_wait_cqe(ring, cqe)
+            ready = liburing.io_uring_cq_ready(ring)
+            for k in range(ready):
+                entry = cqe[k]
+                if entry.user_data < len(targets):
+                    try:
+                        code = entry.res
+                    except OSError as e:  # liburing raises negative results as OSError
+                        code = e.errno
+                    # A connect cancelled by its linked timeout reports ECANCELED
+                    results[entry.user_data] = errno.ETIMEDOUT if code == errno.ECANCELED else code
+            liburing.io_uring_cq_advance(ring, ready)
+            pending -= ready
+        return results
+    finally:
+        for sock in socks:
+            sock.close()
+        liburing.io_uring_queue_exit(ring)
+
+async def connect_all(targets):
+    """
+    Run connect probes for (host, port, timeout) targets side by side
+    
+    Uses one io_uring batch when available, otherwise one connect_async per target.
+    
+    Returns:
+        list: Result code (or raised exception) per target
+    """
+    if _HAS_LIBURING:
+        try:
+            return await asyncio.to_thread(connect_many_uring, targets)
+        except socket.gaierror:
+            pass  # DNS failure, not io_uring: connect_async re-raises it per target below
+        except OSError as e:
+            # Ring setup or submission failed
+            print(f"  (io_uring unavailable, using asyncio connects: {e})")
+    return await asyncio.gather(
+        *(connect_async(host, port, timeout) for host, port, timeout in targets),
+        return_exceptions=True
+    )
+
+# --- Native WLAN API (wlanapi.dll) structures, only the fields we read ---
+class _GUID(ctypes.Structure):
+    _fields_ = [("Data1", ctypes.c_ulong), ("Data2", ctypes.c_ushort),
+                ("Data3", ctypes.c_ushort), ("Data4", ctypes.c_ubyte * 8)]
+
+class _WLAN_INTERFACE_INFO(ctypes.Structure):
+    _fields_ = [("InterfaceGuid", _GUID),
+                ("strInterfaceDescription", ctypes.c_wchar * 256),
+                ("isState", ctypes.c_uint)]
+
+class _WLAN_INTERFACE_INFO_LIST(ctypes.Structure):
+    _fields_ = [("dwNumberOfItems", ctypes.c_ulong),
+                ("dwIndex", ctypes.c_ulong),
+                ("InterfaceInfo", _WLAN_INTERFACE_INFO * 1)]
+
+class _DOT11_SSID(ctypes.Structure):
+    _fields_ = [("uSSIDLength", ctypes.c_ulong), ("ucSSID", ctypes.c_ubyte * 32)]
+
+class _WLAN_CONNECTION_ATTRIBUTES(ctypes.Structure):
+    # Truncated after wlanAssociationAttributes.dot11Ssid (the rest is never read)
+    _fields_ = [("isState", ctypes.c_uint),
+                ("wlanConnectionMode", ctypes.c_uint),
+                ("strProfileName", ctypes.c_wchar * 256),
+                ("dot11Ssid", _DOT11_SSID)]
+
+_WLAN_CLIENT_VERSION = 2                   # Windows Vista and later
+_WLAN_INTF_OPCODE_CURRENT_CONNECTION = 7
+_WLAN_INTERFACE_STATE_CONNECTED = 1
+
+def get_connected_ssids():
+    """
+    Read the SSIDs of all connected WiFi interfaces via the Windows WLAN API
+    
+    Returns:
+        list: SSIDs as bytes (empty if no interface is connected)
+    
+    Raises:
+        OSError: If the WLAN service is unavailable
+    """
+    wlanapi = ctypes.windll.wlanapi
+    handle = ctypes.c_void_p()
+    negotiated = ctypes.c_ulong()
+    err = wlanapi.WlanOpenHandle(_WLAN_CLIENT_VERSION, None,
+                                 ctypes.byref(negotiated), ctypes.byref(handle))
+    if err:
+        raise ctypes.WinError(err)
+    
+    ssids = []
+    iface_list = ctypes.POINTER(_WLAN_INTERFACE_INFO_LIST)()
+    try:
+        err = wlanapi.WlanEnumInterfaces(handle, None, ctypes.byref(iface_list))
+        if err:
+            raise ctypes.WinError(err)
+        count = iface_list.contents.dwNumberOfItems
+        ifaces = ctypes.cast(iface_list.contents.InterfaceInfo,
+                             ctypes.POINTER(_WLAN_INTERFACE_INFO * count)).contents
+        for iface in ifaces:
+            if iface.isState != _WLAN_INTERFACE_STATE_CONNECTED:
+                continue
+            data_size = ctypes.c_ulong()
+            data = ctypes.POINTER(_WLAN_CONNECTION_ATTRIBUTES)()
+            err = wlanapi.WlanQueryInterface(handle, ctypes.byref(iface.InterfaceGuid),
+                                             _WLAN_INTF_OPCODE_CURRENT_CONNECTION, None,
+                                             ctypes.byref(data_size), ctypes.byref(data), None)
+            if err:
+                continue
+            try:
+                ssid = data.contents.dot11Ssid
+                ssids.append(bytes(ssid.ucSSID[:ssid.uSSIDLength]))
+            finally:
+                wlanapi.WlanFreeMemory(data)
+    finally:
+        if iface_list:
+            wlanapi.WlanFreeMemory(iface_list)
+        wlanapi.WlanCloseHandle(handle, None)
+    return ssids
+
 def check_wifi_connection(ssid="ESP32_AP"):
     """Check if connected to ESP32 WiFi"""
     print(f"Checking WiFi connection to '{ssid}'...")
     
     if platform.system() == "Windows":
         try:
-            result = subprocess.run(
-                ["netsh", "wlan", "show", "interfaces"],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if ssid in result.stdout:
+            if ssid.encode('utf-8') in get_connected_ssids():
                 print(f"[OK] Connected to '{ssid}'")
                 return True
             else:
@@ -42,99 +248,164 @@ def check_wifi_connection(ssid="ESP32_AP"):
         print("[WARN] WiFi check not implemented for this OS")
         return None
 
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+_TCP_ECHO_PORT = 7  # any port works: an accept OR a refusal proves the host answered
+
+def _icmp_checksum(data):
+    """16-bit one's-complement checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def icmp_echo(host, timeout=2):
+    """
+    Send a single ICMP echo request from Python (no ping process)
+    
+    Tries an unprivileged ICMP datagram socket first (Linux/Mac), then a raw socket.
+    
+    Returns:
+        bool: True if an echo reply arrived within timeout, False otherwise
+        None: If this process isn't allowed to open an ICMP socket
+    """
+    addr = socket.gethostbyname(host)
+    ident = os.getpid() & 0xFFFF
+    payload = b"esp32-diag"
+    header = struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0, 0, ident, 1)
+    packet = struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0,
+                         _icmp_checksum(header + payload), ident, 1) + payload
+    
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            break
+        except OSError:
+            continue
+    else:
+        return None
+    
+    with sock, selectors.DefaultSelector() as sel:
+        sock.setblocking(False)
+        sock.sendto(packet, (addr, 0))
+        sel.register(sock, selectors.EVENT_READ)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not sel.select(remaining):
+                return False
+            data, (src, _) = sock.recvfrom(1024)
+            # Raw sockets (and Mac datagram sockets) include the IPv4 header
+            if data and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0F) * 4:]
+            if src != addr or len(data) < 8:
+                continue
+            icmp_type, _, _, reply_id, _ = struct.unpack("!BBHHH", data[:8])
+            # Datagram sockets rewrite the identifier, the kernel already filters replies
+            if icmp_type == _ICMP_ECHO_REPLY and (sock_type == socket.SOCK_DGRAM or reply_id == ident):
+                return True
+
+def probe_ping(host, timeout=2):
+    """Check reachability without printing (ICMP echo, TCP probe if ICMP isn't allowed)"""
+    reachable = icmp_echo(host, timeout)
+    if reachable is None:
+        # No ICMP socket allowed (e.g. Windows without admin rights): fall back to a TCP probe
+        result = connect_nonblocking(host, _TCP_ECHO_PORT, timeout)
+        reachable = result == 0 or result in _CONNECTION_REFUSED
+    return reachable
+
+def report_ping(host, outcome):
+    """Print the result of probe_ping (or the exception it raised)"""
+    if isinstance(outcome, Exception):
+        print(f"✗ Ping failed: {outcome}")
+        return False
+    if outcome:
+        print(f"✓ {host} is reachable")
+        return True
+    else:
+        print(f"✗ {host} is not reachable")
+        return False
+
 def ping_host(host, timeout=2):
     """Ping host to check if it's reachable"""
     print(f"Pinging {host}...")
     
-    if platform.system() == "Windows":
-        try:
-            result = subprocess.run(
-                ["ping", "-n", "1", "-w", str(timeout * 1000), host],
-                capture_output=True,
-                timeout=timeout + 1
-            )
-            if result.returncode == 0:
-                print(f"✓ {host} is reachable")
-                return True
-            else:
-                print(f"✗ {host} is not reachable")
-                return False
-        except Exception as e:
-            print(f"✗ Ping failed: {e}")
-            return False
+    try:
+        outcome = probe_ping(host, timeout)
+    except Exception as e:
+        outcome = e
+    return report_ping(host, outcome)
+
+def report_port(host, port, outcome):
+    """Print the result of a port probe (connect error code or exception)"""
+    if isinstance(outcome, socket.gaierror):
+        print(f"[FAIL] DNS/Hostname resolution failed: {outcome}")
+        return False
+    if isinstance(outcome, Exception):
+        print(f"[FAIL] Connection test failed: {outcome}")
+        return False
+    
+    result = outcome
+    if result == 0:
+        print(f"[OK] Port {port} is open and accepting connections")
+        return True
     else:
-        # Linux/Mac
-        try:
-            result = subprocess.run(
-                ["ping", "-c", "1", "-W", str(timeout), host],
-                capture_output=True,
-                timeout=timeout + 1
-            )
-            if result.returncode == 0:
-                print(f"✓ {host} is reachable")
-                return True
-            else:
-                print(f"✗ {host} is not reachable")
-                return False
-        except Exception as e:
-            print(f"✗ Ping failed: {e}")
-            return False
+        print(f"[FAIL] Port {port} is closed or not accepting connections")
+        print(f"  Error code: {result}")
+        if result in _CONNECTION_REFUSED:
+            print("  -> This means the ESP32 is reachable but not listening on this port")
+            print("  -> Make sure the ESP32 firmware is uploaded and running")
+        elif result in _CONNECTION_TIMED_OUT:
+            print("  -> This means the ESP32 might not be reachable or firewall is blocking")
+        return False
 
 def check_port(host, port, timeout=3):
     """Check if port is open and accepting connections"""
     print(f"Checking port {port} on {host}...")
     
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        result = sock.connect_ex((host, port))
-        sock.close()
-        
-        if result == 0:
-            print(f"[OK] Port {port} is open and accepting connections")
-            return True
-        else:
-            print(f"[FAIL] Port {port} is closed or not accepting connections")
-            print(f"  Error code: {result}")
-            if result == 10061:  # Windows: Connection refused
-                print("  -> This means the ESP32 is reachable but not listening on this port")
-                print("  -> Make sure the ESP32 firmware is uploaded and running")
-            elif result == 10060:  # Windows: Connection timeout
-                print("  -> This means the ESP32 might not be reachable or firewall is blocking")
-            return False
-    except socket.gaierror as e:
-        print(f"[FAIL] DNS/Hostname resolution failed: {e}")
-        return False
+        outcome = connect_nonblocking(host, port, timeout)
     except Exception as e:
-        print(f"[FAIL] Connection test failed: {e}")
-        return False
+        outcome = e
+    return report_port(host, port, outcome)
 
-def test_tcp_connection(host, port, timeout=5):
-    """Test actual TCP connection"""
-    print(f"\nTesting TCP connection to {host}:{port}...")
+def report_tcp_connection(host, port, timeout, outcome):
+    """Print the result of a TCP connection attempt (connect error code or exception)"""
+    if isinstance(outcome, socket.error):
+        print(f"[FAIL] Connection failed: {outcome}")
+        return False
+    if isinstance(outcome, Exception):
+        print(f"[FAIL] Unexpected error: {outcome}")
+        return False
     
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        sock.connect((host, port))
+    result = outcome
+    if result == 0:
         print(f"[OK] Successfully connected to {host}:{port}")
-        sock.close()
         return True
-    except socket.timeout:
+    elif result in _CONNECTION_TIMED_OUT:
         print(f"[FAIL] Connection timeout after {timeout} seconds")
         return False
-    except ConnectionRefusedError:
+    elif result in _CONNECTION_REFUSED:
         print(f"[FAIL] Connection refused - ESP32 is not listening on port {port}")
         print("  -> Make sure ESP32 firmware is uploaded and server is running")
         return False
-    except socket.error as e:
-        print(f"[FAIL] Connection failed: {e}")
+    else:
+        print(f"[FAIL] Connection failed: [Errno {result}] {os.strerror(result)}")
         return False
+
+def test_tcp_connection(host, port, timeout=5):
+    """Test actual TCP connection"""
+    print(f"\nTesting TCP connection to {host}:{port}...")
+    
+    try:
+        outcome = connect_nonblocking(host, port, timeout)
     except Exception as e:
-        print(f"[FAIL] Unexpected error: {e}")
-        return False
+        outcome = e
+    return report_tcp_connection(host, port, timeout, outcome)
 
-def main():
+async def main():
     print("="*80)
     print(" " * 25 + "ESP32 CONNECTION DIAGNOSTICS")
     print("="*80)
@@ -150,16 +421,33 @@ def main():
     wifi_ok = check_wifi_connection()
     print()
     
+    # Steps 2-4 run concurrently; their results are printed in order afterwards
+    ping_timeout, port_timeout, tcp_timeout = 2, 3, 5
+    print(f"Pinging {host}, checking port {port} and testing TCP connection...")
+    ping_res, connect_res = await asyncio.gather(
+        asyncio.to_thread(probe_ping, host, ping_timeout),
+        connect_all([(host, port, port_timeout), (host, port, tcp_timeout)]),
+        return_exceptions=True
+    )
+    if isinstance(connect_res, BaseException):
+        # connect_all itself failed; report the same error for both checks
+        connect_res = [connect_res, connect_res]
+    port_res, tcp_res = connect_res
+    print()
+    
     # Step 2: Ping host
-    ping_ok = ping_host(host)
+    print(f"Pinging {host}...")
+    ping_ok = report_ping(host, ping_res)
     print()
     
     # Step 3: Check port
-    port_ok = check_port(host, port)
+    print(f"Checking port {port} on {host}...")
+    port_ok = report_port(host, port, port_res)
     print()
     
     # Step 4: Test TCP connection
-    tcp_ok = test_tcp_connection(host, port)
+    print(f"\nTesting TCP connection to {host}:{port}...")
+    tcp_ok = report_tcp_connection(host, port, tcp_timeout, tcp_res)
     print()
     
     # Summary
@@ -207,5 +495,5 @@ def main():
     print("="*80)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
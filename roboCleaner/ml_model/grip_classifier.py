@@ -2,11 +2,159 @@
 Grip Classifier
 Uses trained model to classify hand gestures as fist (closed) or palm (open)
 """
+import math
 import numpy as np
 import joblib
 import json
 from pathlib import Path
 
+# Optional: faster JSON parsing
+try:
+    import orjson
+    _HAS_ORJSON = True
+except Exception:
+    orjson = None
+    _HAS_ORJSON = False
+
+# Optional compiled inference backend (used when grip_classifier.onnx is present)
+try:
+    import onnxruntime as ort
+    _HAS_ONNXRUNTIME = True
+except Exception:
+    ort = None
+    _HAS_ONNXRUNTIME = False
+
+# Optional JIT compiler for the per-frame feature extraction
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except Exception:
+    njit = None
+    _HAS_NUMBA = False
+
+DEFAULT_MODEL_DIR = Path(__file__).parent / "grip_models"
+
+# MediaPipe hand model has 21 landmarks; see extract_features for the feature layout
+NUM_LANDMARKS = 21
+FEATURE_DIM = 24
+AVG_TIP_DIST_INDEX = 5  # average wrist-to-fingertip distance (see extract_features)
+
+# Finger tips: thumb(4), index(8), middle(12), ring(16), pinky(20)
+_TIP_IDS = np.array([4, 8, 12, 16, 20])
+# Finger MCPs (base of fingers): index(5), middle(9), ring(13), pinky(17)
+_MCP_IDS = np.array([5, 9, 13, 17])
+
+def _extract_features_loops(points, out):
+    """
+    Same features as extract_features_batch for a single sample, written as
+    scalar loops so Numba can compile it into one native function
+    
+    Args:
+        points: (21, 2) float32 landmark array
+        out: (FEATURE_DIM,) float32 array, filled in place
+    """
+    wx = points[0, 0]
+    wy = points[0, 1]
+    
+    # 1./2. Wrist-to-fingertip distances and their mean, 3. fingertip spread,
+    # 8. fingertips relative to wrist
+    total = 0.0
+    tip_min_x = tip_max_x = points[_TIP_IDS[0], 0]
+    tip_min_y = tip_max_y = points[_TIP_IDS[0], 1]
+    for k in range(5):
+        tx = points[_TIP_IDS[k], 0]
+        ty = points[_TIP_IDS[k], 1]
+        dx = tx - wx
+        dy = ty - wy
+        dist = math.sqrt(dx * dx + dy * dy)
+        out[k] = dist
+        total += dist
+        out[14 + 2 * k] = dx
+        out[15 + 2 * k] = dy
+        tip_min_x = min(tip_min_x, tx)
+        tip_max_x = max(tip_max_x, tx)
+        tip_min_y = min(tip_min_y, ty)
+        tip_max_y = max(tip_max_y, ty)
+    out[5] = total / 5.0
+    out[6] = tip_max_x - tip_min_x
+    out[7] = tip_max_y - tip_min_y
+    
+    # 4. Pinch distance (thumb-index), 5. index-middle distance
+    out[8] = math.hypot(points[4, 0] - points[8, 0], points[4, 1] - points[8, 1])
+    out[9] = math.hypot(points[8, 0] - points[12, 0], points[8, 1] - points[12, 1])
+    
+    # 6. Cosine between adjacent wrist->MCP vectors
+    for k in range(3):
+        ax = points[_MCP_IDS[k], 0] - wx
+        ay = points[_MCP_IDS[k], 1] - wy
+        bx = points[_MCP_IDS[k + 1], 0] - wx
+        by = points[_MCP_IDS[k + 1], 1] - wy
+        norms = math.sqrt(ax * ax + ay * ay) * math.sqrt(bx * bx + by * by)
+        out[10 + k] = (ax * bx + ay * by) / (norms + 1e-6)
+    
+    # 7. Hand area (bounding box of all points)
+    min_x = max_x = points[0, 0]
+    min_y = max_y = points[0, 1]
+    for i in range(1, points.shape[0]):
+        min_x = min(min_x, points[i, 0])
+        max_x = max(max_x, points[i, 0])
+        min_y = min(min_y, points[i, 1])
+        max_y = max(max_y, points[i, 1])
+    out[13] = (max_x - min_x) * (max_y - min_y)
+
+# Only worth it compiled; without Numba extract_features uses extract_features_batch
+_extract_features_nb = njit(cache=True, fastmath=True)(_extract_features_loops) if _HAS_NUMBA else None
+
+def extract_features_batch(raw):
+    """
+    Extract features for a whole stack of samples at once
+    The reference implementation, shared by training and GripClassifier.extract_features
+    
+    Args:
+        raw: Array of shape (N, 21, 2) with landmark points
+    
+    Returns:
+        numpy array: Feature matrix of shape (N, FEATURE_DIM), float32
+    """
+    # Wrist is landmark 0 (kept as (N, 1, 2) so it broadcasts over points)
+    wrist = raw[:, 0:1, :]
+    
+    # Finger tips: thumb(4), index(8), middle(12), ring(16), pinky(20)
+    tips = raw[:, _TIP_IDS, :]
+    
+    # Finger MCPs (base of fingers): index(5), middle(9), ring(13), pinky(17)
+    mcps = raw[:, _MCP_IDS, :]
+    
+    # All feature columns are written straight into one preallocated matrix
+    X = np.empty((len(raw), FEATURE_DIM), dtype=np.float32)
+    
+    # 1. Distances from wrist to each fingertip (N, 5)
+    rel_tips = tips - wrist
+    X[:, 0:5] = np.linalg.norm(rel_tips, axis=2)
+    
+    # 2. Average distance from wrist to fingertips (N,)
+    X[:, 5] = X[:, 0:5].mean(axis=1)
+    
+    # 3. Spread between fingertips (hand width, hand height) (N, 2)
+    X[:, 6:8] = tips.max(axis=1) - tips.min(axis=1)
+    
+    # 4./5. Pinch distance and index-middle distance (N, 2)
+    X[:, 8:10] = np.linalg.norm(tips[:, [0, 1], :] - tips[:, [1, 2], :], axis=2)
+    
+    # 6. Angles between fingers (cosine between adjacent wrist->MCP vectors) (N, 3)
+    vecs = mcps - wrist
+    norms = np.linalg.norm(vecs, axis=2)
+    X[:, 10:13] = (vecs[:, :-1] * vecs[:, 1:]).sum(axis=2) / (norms[:, :-1] * norms[:, 1:] + 1e-6)
+    
+    # 7. Hand area (approximate using bounding box of all points) (N,)
+    extent = raw.max(axis=1) - raw.min(axis=1)
+    X[:, 13] = extent[:, 0] * extent[:, 1]
+    
+    # 8. Normalized coordinates (relative to wrist) (N, 10)
+    X[:, 14:24] = rel_tips.reshape(len(raw), rel_tips.shape[1] * 2)
+    
+    return X
+
 class GripClassifier:
     """Classify hand gestures using trained model"""
     
@@ -20,21 +168,48 @@ class GripClassifier:
         """
         if model_path is None:
             # Default path
-            script_dir = Path(__file__).parent
-            model_path = script_dir / "grip_models" / "grip_classifier.pkl"
+            model_path = DEFAULT_MODEL_DIR / "grip_classifier.pkl"
         
         self.model_path = Path(model_path)
         self.model = None
         self.metadata = None
+        self.session = None
+        self._onnx_input = None
+        self._linear = None
+        self._gate = None
+        
+        # Reusable per-frame buffers (filled in place by extract_features)
+        self._pts = np.empty((NUM_LANDMARKS, 2), dtype=np.float32)
+        self._feat = np.empty(FEATURE_DIM, dtype=np.float32)
+        
+        global _extract_features_nb
+        if _extract_features_nb is not None:
+            # Compile (or load from cache) now rather than on the first camera frame
+            # and check it against the NumPy features the model was trained on
+            sample = np.random.default_rng(0).random((NUM_LANDMARKS, 2), dtype=np.float32)
+            try:
+                _extract_features_nb(sample, self._feat)
+                matches = np.allclose(self._feat, extract_features_batch(sample[None])[0],
+                                      rtol=1e-4, atol=1e-5)
+            except Exception as e:
+                print(f"⚠ Numba feature extraction unavailable, using NumPy: {e}")
+                matches = None
+            if matches is False:
+                print("⚠ Numba feature extraction disagrees with extract_features_batch, using NumPy")
+            if not matches:
+                _extract_features_nb = None
         
         if self.model_path.exists():
             try:
-                self.model = joblib.load(self.model_path)
+                self.model = self._load_model(self.model_path)
                 # Load metadata if available
                 metadata_path = self.model_path.parent / "model_metadata.json"
                 if metadata_path.exists():
-                    with open(metadata_path, 'r') as f:
-                        self.metadata = json.load(f)
+                    if _HAS_ORJSON:
+                        self.metadata = orjson.loads(metadata_path.read_bytes())
+                    else:
+                        with open(metadata_path, 'r') as f:
+                            self.metadata = json.load(f)
                 print(f"✓ Loaded grip classifier from {self.model_path}")
             except Exception as e:
                 print(f"⚠ Failed to load grip classifier: {e}")
@@ -42,6 +217,88 @@ class GripClassifier:
         else:
             print(f"⚠ Grip classifier model not found at {self.model_path}")
             print(f"  Run train_grip_classifier.py to train a model")
+        
+        # Scalar gate from training: clearly open/closed hands skip the model
+        if self.metadata is not None and self.metadata.get('confidence_gate'):
+            gate = self.metadata['confidence_gate']
+            # A side is only used with the precision measured for it on held-out data
+            lo_conf, hi_conf = gate.get('lo_confidence'), gate.get('hi_confidence')
+            lo = gate['lo'] if gate.get('lo') is not None and lo_conf is not None else -math.inf
+            hi = gate['hi'] if gate.get('hi') is not None and hi_conf is not None else math.inf
+            if lo > -math.inf or hi < math.inf:
+                self._gate = (gate.get('feature_index', AVG_TIP_DIST_INDEX), lo, lo_conf, hi, hi_conf)
+        
+        # Logistic regression reduces to a single dot product; skip sklearn for it
+        if self.model is not None:
+            self._linear = self._linear_params(self.model)
+        
+        # Prefer the ONNX export of the same model when onnxruntime is installed
+        # (a folded linear model is cheaper than any session, so it never needs one)
+        onnx_path = self.model_path.with_suffix(".onnx")
+        if self._linear is None and _HAS_ONNXRUNTIME and onnx_path.exists():
+            try:
+                so = ort.SessionOptions()
+                so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                so.intra_op_num_threads = 1  # single-sample latency, no thread pool wakeups
+                self.session = ort.InferenceSession(
+                    str(onnx_path), sess_options=so, providers=['CPUExecutionProvider']
+                )
+                self._onnx_input = self.session.get_inputs()[0].name
+                print(f"✓ Using ONNX runtime for grip classifier ({onnx_path.name})")
+            except Exception as e:
+                print(f"⚠ Failed to load ONNX grip classifier, using sklearn model: {e}")
+                self.session = None
+    
+    @staticmethod
+    def _load_model(model_path):
+        """
+        Load the pickled model, mapping its numpy payloads read-only from disk
+        
+        libsvm needs writable support vectors (predict_proba raises "buffer
+        source array is read-only" on mapped ones), so SVMs are loaded again
+        normally. Note that on Windows a mapped .pkl can't be overwritten by
+        retraining while it is loaded.
+        """
+        model = joblib.load(model_path, mmap_mode='r')
+        try:
+            from sklearn.svm import SVC, NuSVC
+        except ImportError:
+            return model
+        clf = model.steps[-1][1] if hasattr(model, 'steps') else model
+        if isinstance(clf, (SVC, NuSVC)):
+            model = joblib.load(model_path)
+        return model
+    
+    @staticmethod
+    def _linear_params(model):
+        """
+        Fold a (StandardScaler +) binary LogisticRegression into raw weights
+        
+        Returns:
+            tuple: (w, b) with w @ features + b equal to the model's decision
+                   function, or None if the model isn't a binary logistic regression
+        """
+        try:
+            from sklearn.linear_model import LogisticRegression
+        except ImportError:
+            return None
+        
+        steps = [step for _, step in model.steps] if hasattr(model, 'steps') else [model]
+        clf = steps[-1]
+        if not isinstance(clf, LogisticRegression) or list(clf.classes_) != [0, 1]:
+            return None
+        
+        w = clf.coef_.ravel().astype(np.float64)
+        b = float(clf.intercept_[0])
+        # Apply preprocessing steps in reverse: w.((x - mean) / scale) + b
+        for step in reversed(steps[:-1]):
+            if not hasattr(step, 'scale_') or not hasattr(step, 'mean_'):
+                return None
+            if step.scale_ is not None:
+                w = w / step.scale_
+            if step.mean_ is not None:
+                b -= float(w @ step.mean_)
+        return w.astype(np.float32), b
     
     def extract_features(self, landmarks):
         """
@@ -53,77 +310,34 @@ class GripClassifier:
                       OR MediaPipe landmark object with .landmark attribute
         
         Returns:
-            numpy array: Feature vector or None if invalid
+            numpy array: Feature vector of shape (1, FEATURE_DIM) or None if invalid.
+                         This is a view of an internal buffer that is overwritten
+                         on the next call; copy it if you need to keep it.
         """
-        # Handle MediaPipe landmark object
-        if hasattr(landmarks, 'landmark'):
-            points = []
-            for lm in landmarks.landmark:
-                points.append([lm.x, lm.y])
-            landmarks = points
+        points = self._pts
+        feat = self._feat
         
-        if len(landmarks) != 21:
-            return None
-        
-        # Convert to numpy array
-        points = np.array(landmarks)
-        
-        # Wrist is landmark 0
-        wrist = points[0]
-        
-        # Finger tips: thumb(4), index(8), middle(12), ring(16), pinky(20)
-        tips = [points[4], points[8], points[12], points[16], points[20]]
-        
-        # Finger MCPs (base of fingers): index(5), middle(9), ring(13), pinky(17)
-        mcps = [points[5], points[9], points[13], points[17]]
-        
-        features = []
-        
-        # 1. Distances from wrist to each fingertip (5 features)
-        for tip in tips:
-            dist = np.linalg.norm(tip - wrist)
-            features.append(dist)
-        
-        # 2. Average distance from wrist to fingertips
-        avg_tip_dist = np.mean([np.linalg.norm(tip - wrist) for tip in tips])
-        features.append(avg_tip_dist)
-        
-        # 3. Spread between fingertips (hand width)
-        tip_x_coords = [tip[0] for tip in tips]
-        tip_y_coords = [tip[1] for tip in tips]
-        hand_width = max(tip_x_coords) - min(tip_x_coords)
-        hand_height = max(tip_y_coords) - min(tip_y_coords)
-        features.extend([hand_width, hand_height])
-        
-        # 4. Distance between thumb tip and index tip (pinch distance)
-        thumb_index_dist = np.linalg.norm(tips[0] - tips[1])
-        features.append(thumb_index_dist)
-        
-        # 5. Distance between index and middle tips
-        index_middle_dist = np.linalg.norm(tips[1] - tips[2])
-        features.append(index_middle_dist)
-        
-        # 6. Angles between fingers (using MCPs)
-        for i in range(len(mcps) - 1):
-            vec1 = mcps[i] - wrist
-            vec2 = mcps[i+1] - wrist
-            # Cosine of angle
-            cos_angle = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2) + 1e-6)
-            features.append(cos_angle)
+        # Fill the landmark buffer in place
+        if hasattr(landmarks, 'landmark'):
+            # Handle MediaPipe landmark object
+            if len(landmarks.landmark) != NUM_LANDMARKS:
+                return None
+            for i, lm in enumerate(landmarks.landmark):
+                points[i, 0] = lm.x
+                points[i, 1] = lm.y
+        else:
+            if len(landmarks) != NUM_LANDMARKS:
+                return None
+            np.copyto(points, landmarks)
         
-        # 7. Hand area (approximate using bounding box)
-        all_x = [p[0] for p in points]
-        all_y = [p[1] for p in points]
-        hand_area = (max(all_x) - min(all_x)) * (max(all_y) - min(all_y))
-        features.append(hand_area)
+        if _extract_features_nb is not None:
+            _extract_features_nb(points, feat)
+            return feat.reshape(1, -1)
         
-        # 8. Normalized coordinates (relative to wrist)
-        for tip in tips:
-            rel_x = tip[0] - wrist[0]
-            rel_y = tip[1] - wrist[1]
-            features.extend([rel_x, rel_y])
+        # Same code path as training
+        feat[:] = extract_features_batch(points[None])[0]
         
-        return np.array(features)
+        return feat.reshape(1, -1)
     
     def predict(self, landmarks):
         """
@@ -138,23 +352,47 @@ class GripClassifier:
                 - 'confidence': float (0-1, confidence in prediction)
                 - 'raw_value': float (raw model output)
         """
-        if self.model is None:
+        if not self.is_available():
             return None
         
         features = self.extract_features(landmarks)
         if features is None:
             return None
         
-        # Reshape for single sample
-        features = features.reshape(1, -1)
+        if self._gate is not None:
+            index, lo, lo_conf, hi, hi_conf = self._gate
+            value = features[0, index]
+            if value < lo:
+                return self._result(0, np.array([lo_conf, 1.0 - lo_conf]))
+            if value > hi:
+                return self._result(1, np.array([1.0 - hi_conf, hi_conf]))
+        
+        if self._linear is not None:
+            w, b = self._linear
+            score = float(w @ features[0]) + b
+            p_palm = 0.5 * (1.0 + math.tanh(0.5 * score))  # numerically stable sigmoid
+            return self._result(int(score > 0), np.array([1.0 - p_palm, p_palm]))
         
-        # Predict
-        prediction = self.model.predict(features)[0]
-        probabilities = None
+        if self.session is not None:
+            # ONNX export outputs (label, probabilities) in a single run
+            labels, probs = self.session.run(None, {self._onnx_input: features})
+            return self._result(labels[0], probs[0])
         
-        # Get confidence if model supports it
+        # One model evaluation: the class is the most probable column
         if hasattr(self.model, 'predict_proba'):
             probabilities = self.model.predict_proba(features)[0]
+            prediction = self.model.classes_[int(np.argmax(probabilities))]
+            return self._result(prediction, probabilities)
+        
+        # No probabilities (e.g. SVC without probability=True): sign of the decision function
+        score = self.model.decision_function(features)[0]
+        prediction = self.model.classes_[int(score > 0)]
+        return self._result(prediction, None)
+    
+    @staticmethod
+    def _result(prediction, probabilities):
+        """Build the predict() result dict"""
+        if probabilities is not None:
             confidence = max(probabilities)
         else:
             confidence = 1.0  # Default if no probability available
@@ -168,5 +406,5 @@ class GripClassifier:
     
     def is_available(self):
         """Check if classifier is loaded and ready"""
-        return self.model is not None
+        return self.model is not None or self.session is not None
 
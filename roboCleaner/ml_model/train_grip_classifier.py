@@ -3,21 +3,82 @@ Train Grip Classifier Model
 Uses MediaPipe hand landmarks from fist_data/fist.json and palm.json
 to train a classifier that distinguishes between fist (closed) and palm (open)
 """
+import io
 import json
 import numpy as np
 import os
 import sys
+from contextlib import redirect_stdout
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import SVC
+from sklearn.linear_model import LogisticRegression
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
+from joblib import Parallel, delayed
+
+# Optional: faster JSON parsing/serialization
+try:
+    import orjson
+    _HAS_ORJSON = True
+except Exception:
+    orjson = None
+    _HAS_ORJSON = False
+
+# Optional: export the trained model to ONNX for faster inference
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+    _HAS_SKL2ONNX = True
+except Exception:
+    _HAS_SKL2ONNX = False
+
+try:
+    import onnxruntime as ort
+    _HAS_ONNXRUNTIME = True
+except Exception:
+    ort = None
+    _HAS_ONNXRUNTIME = False
+
+# Required precision of the scalar gate that lets GripClassifier skip the model
+GATE_MIN_PRECISION = 0.99
+# ...measured over windows of this many training samples around each threshold
+GATE_MIN_SAMPLES = 100
+# ...and the fewest held-out samples a gated side must be confirmed on
+GATE_MIN_TEST_SAMPLES = 25
+
+# Minimum fraction of samples on which the ONNX export must agree with the sklearn model
+ONNX_MIN_AGREEMENT = 0.999
+
+# Candidate models, cheapest inference first (ties in accuracy go to the earlier one)
+MODEL_TYPES = ['logistic_regression', 'mlp', 'random_forest', 'svm']
+
+# Candidates train in parallel, one process each; the forest's threads get the cores
+# the other (single-threaded) candidates leave free so they don't oversubscribe
+RF_N_JOBS = max(1, (os.cpu_count() or 1) - (len(MODEL_TYPES) - 1))
+
+MODEL_LABELS = {
+    'logistic_regression': "Logistic Regression",
+    'mlp': "MLP",
+    'random_forest': "Random Forest",
+    'svm': "SVM",
+}
 
 # Add project root to path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+# Share feature extraction with inference so training and runtime features can't drift apart
+try:
+    from ml_model.grip_classifier import GripClassifier, extract_features_batch, AVG_TIP_DIST_INDEX
+except ImportError:
+    # Running as a script from inside ml_model/
+    from grip_classifier import GripClassifier, extract_features_batch, AVG_TIP_DIST_INDEX
+
 def load_landmark_data(json_file_path, label):
     """
     Load MediaPipe hand landmarks from JSON file
@@ -35,8 +96,12 @@ def load_landmark_data(json_file_path, label):
     
     print(f"Loading {json_file_path}...")
     
-    with open(json_file_path, 'r') as f:
-        data = json.load(f)
+    if _HAS_ORJSON:
+        with open(json_file_path, 'rb') as f:
+            data = orjson.loads(f.read())
+    else:
+        with open(json_file_path, 'r') as f:
+            data = json.load(f)
     
     count = 0
     for sample_id, sample_data in data.items():
@@ -59,154 +124,110 @@ def load_landmark_data(json_file_path, label):
     print(f"  Loaded {count} samples with label '{label}'")
     return features, labels
 
-def extract_advanced_features(landmarks):
+def load_raw_landmarks(fist_json_path, palm_json_path, cache_path=None):
     """
-    Extract advanced features from MediaPipe landmarks
-    These features are more robust than raw coordinates
+    Load raw landmarks for both classes as one stacked array
+    
+    The JSON files are only parsed when the cache is missing or older than them;
+    otherwise the arrays come straight from the .npz cache.
     
     Args:
-        landmarks: List of 21 landmark points [[x1, y1], [x2, y2], ...]
+        fist_json_path: Path to fist.json
+        palm_json_path: Path to palm.json
+        cache_path: Optional .npz cache file (None disables caching)
     
     Returns:
-        list: Advanced feature vector
+        raw: Landmark array of shape (N, 21, 2), float32
+        y: Label vector (0=fist, 1=palm), int8
     """
-    if len(landmarks) != 21:
-        return None
-    
-    # Convert to numpy array
-    points = np.array(landmarks)
+    json_mtime = max(os.path.getmtime(fist_json_path), os.path.getmtime(palm_json_path))
+    if cache_path is not None and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= json_mtime:
+        with np.load(cache_path) as cached:
+            raw, y = cached['X'], cached['y']
+        print(f"Loaded {len(raw)} samples from cache {cache_path}")
+        return raw, y
     
-    # Wrist is landmark 0
-    wrist = points[0]
-    
-    # Finger tips: thumb(4), index(8), middle(12), ring(16), pinky(20)
-    tips = [points[4], points[8], points[12], points[16], points[20]]
-    
-    # Finger MCPs (base of fingers): index(5), middle(9), ring(13), pinky(17)
-    mcps = [points[5], points[9], points[13], points[17]]
-    
-    features = []
+    fist_features, fist_labels = load_landmark_data(fist_json_path, label=0)  # 0 = closed/fist
+    palm_features, palm_labels = load_landmark_data(palm_json_path, label=1)  # 1 = open/palm
     
-    # 1. Distances from wrist to each fingertip (5 features)
-    for tip in tips:
-        dist = np.linalg.norm(tip - wrist)
-        features.append(dist)
-    
-    # 2. Average distance from wrist to fingertips
-    avg_tip_dist = np.mean([np.linalg.norm(tip - wrist) for tip in tips])
-    features.append(avg_tip_dist)
-    
-    # 3. Spread between fingertips (hand width)
-    tip_x_coords = [tip[0] for tip in tips]
-    tip_y_coords = [tip[1] for tip in tips]
-    hand_width = max(tip_x_coords) - min(tip_x_coords)
-    hand_height = max(tip_y_coords) - min(tip_y_coords)
-    features.extend([hand_width, hand_height])
-    
-    # 4. Distance between thumb tip and index tip (pinch distance)
-    thumb_index_dist = np.linalg.norm(tips[0] - tips[1])
-    features.append(thumb_index_dist)
-    
-    # 5. Distance between index and middle tips
-    index_middle_dist = np.linalg.norm(tips[1] - tips[2])
-    features.append(index_middle_dist)
-    
-    # 6. Angles between fingers (using MCPs)
-    for i in range(len(mcps) - 1):
-        vec1 = mcps[i] - wrist
-        vec2 = mcps[i+1] - wrist
-        # Cosine of angle
-        cos_angle = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2) + 1e-6)
-        features.append(cos_angle)
-    
-    # 7. Hand area (approximate using convex hull or bounding box)
-    # Simple: use spread of all points
-    all_x = [p[0] for p in points]
-    all_y = [p[1] for p in points]
-    hand_area = (max(all_x) - min(all_x)) * (max(all_y) - min(all_y))
-    features.append(hand_area)
-    
-    # 8. Normalized coordinates (relative to wrist)
-    for tip in tips:
-        rel_x = tip[0] - wrist[0]
-        rel_y = tip[1] - wrist[1]
-        features.extend([rel_x, rel_y])
-    
-    return features
+    # Stack everything into one preallocated (N, 21, 2) tensor, filled in place:
+    # each flat [x1, y1, x2, y2, ...] row becomes a [[x1, y1], [x2, y2], ...] block
+    n_fist, n_palm = len(fist_features), len(palm_features)
+    raw = np.empty((n_fist + n_palm, 21, 2), dtype=np.float32)
+    flat = raw.reshape(-1, 42)
+    if n_fist:
+        flat[:n_fist] = fist_features
+    if n_palm:
+        flat[n_fist:] = palm_features
+    y = np.empty(n_fist + n_palm, dtype=np.int8)
+    y[:n_fist] = 0
+    y[n_fist:] = 1
+    
+    if cache_path is not None:
+        np.savez(cache_path, X=raw, y=y)
+        print(f"Cached raw landmarks to {cache_path}")
+    
+    return raw, y
 
-def load_data_with_advanced_features(fist_json_path, palm_json_path):
+def load_data_with_advanced_features(fist_json_path, palm_json_path, cache_path=None):
     """
     Load data and extract advanced features
     
+    Args:
+        fist_json_path: Path to fist.json
+        palm_json_path: Path to palm.json
+        cache_path: Optional .npz cache for the raw landmarks (see load_raw_landmarks)
+    
     Returns:
         X: Feature matrix
         y: Label vector (0=fist, 1=palm)
     """
     # Load raw landmarks
-    fist_features, fist_labels = load_landmark_data(fist_json_path, label=0)  # 0 = closed/fist
-    palm_features, palm_labels = load_landmark_data(palm_json_path, label=1)  # 1 = open/palm
+    raw, y = load_raw_landmarks(fist_json_path, palm_json_path, cache_path)
+    fist_count = int(np.sum(y == 0))
+    palm_count = len(y) - fist_count
     
-    print(f"\nTotal samples: {len(fist_features)} fist + {len(palm_features)} palm = {len(fist_features) + len(palm_features)}")
+    print(f"\nTotal samples: {fist_count} fist + {palm_count} palm = {len(y)}")
     
     # Convert to advanced features
     print("\nExtracting advanced features...")
-    advanced_features = []
-    advanced_labels = []
-    
-    # Process fist data
-    for landmarks_flat in fist_features:
-        # Reshape: [x1, y1, x2, y2, ...] -> [[x1, y1], [x2, y2], ...]
-        landmarks = [[landmarks_flat[i], landmarks_flat[i+1]] for i in range(0, len(landmarks_flat), 2)]
-        features = extract_advanced_features(landmarks)
-        if features:
-            advanced_features.append(features)
-            advanced_labels.append(0)
-    
-    # Process palm data
-    for landmarks_flat in palm_features:
-        landmarks = [[landmarks_flat[i], landmarks_flat[i+1]] for i in range(0, len(landmarks_flat), 2)]
-        features = extract_advanced_features(landmarks)
-        if features:
-            advanced_features.append(features)
-            advanced_labels.append(1)
-    
-    print(f"Extracted {len(advanced_features)} feature vectors")
-    print(f"Feature vector size: {len(advanced_features[0]) if advanced_features else 0}")
-    
-    return np.array(advanced_features), np.array(advanced_labels)
+    X = extract_features_batch(raw)
+    
+    print(f"Extracted {len(X)} feature vectors")
+    print(f"Feature vector size: {X.shape[1]}")
+    
+    return X, y
 
-def train_model(X, y, model_type='random_forest'):
+def make_model(model_type='random_forest'):
     """
-    Train grip classification model
+    Build an untrained grip classification model
     
     Args:
-        X: Feature matrix
-        y: Label vector
-        model_type: 'random_forest' or 'svm'
+        model_type: One of MODEL_TYPES
     
     Returns:
-        Trained model
+        Unfitted sklearn estimator
     """
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
-    
-    print(f"\nTraining set: {len(X_train)} samples")
-    print(f"Test set: {len(X_test)} samples")
-    
-    # Train model
     if model_type == 'random_forest':
-        print("\nTraining Random Forest Classifier...")
-        model = RandomForestClassifier(
+        return RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
             random_state=42,
-            n_jobs=-1
+            n_jobs=RF_N_JOBS
+        )
+    elif model_type == 'logistic_regression':
+        # Scaler is folded into the weights at inference time (see GripClassifier)
+        return make_pipeline(
+            StandardScaler(),
+            LogisticRegression(C=1.0, solver='lbfgs', max_iter=500)
+        )
+    elif model_type == 'mlp':
+        return make_pipeline(
+            StandardScaler(),
+            MLPClassifier(hidden_layer_sizes=(16,), activation='relu', max_iter=500, random_state=42)
         )
     elif model_type == 'svm':
-        print("\nTraining SVM Classifier...")
-        model = SVC(
+        return SVC(
             kernel='rbf',
             C=1.0,
             gamma='scale',
@@ -215,7 +236,14 @@ def train_model(X, y, model_type='random_forest'):
         )
     else:
         raise ValueError(f"Unknown model type: {model_type}")
+
+def _fit(model, X_train, y_train, X_test, y_test):
+    """
+    Fit model on the training split and report its held-out performance
     
+    Returns:
+        float: Accuracy on the test split
+    """
     model.fit(X_train, y_train)
     
     # Evaluate
@@ -232,7 +260,179 @@ def train_model(X, y, model_type='random_forest'):
     print(confusion_matrix(y_test, y_pred))
     print(f"{'='*60}\n")
     
-    return model
+    return accuracy
+
+def _gate_side(v, hit, min_precision, window):
+    """
+    Walk one side of the gate inward from the extreme values
+    
+    The threshold advances only while a window of samples around it still
+    reaches min_precision, so a pure tail can't carry it into the gray zone.
+    
+    Args:
+        v: Feature values ordered from the extreme end inward
+        hit: Whether each sample has the class this side predicts
+        min_precision: Required precision of every window
+        window: Window size (also the fewest samples the side may cover)
+    
+    Returns:
+        tuple: (threshold, samples covered), or (None, 0) if there is no gate
+    """
+    n = len(v)
+    if n <= window:
+        return None, 0
+    
+    # local_ok[j]: the window of samples ending at index window-1+j reaches min_precision
+    csum = np.concatenate(([0], np.cumsum(hit)))
+    local_ok = (csum[window:] - csum[:-window]) / window >= min_precision
+    
+    # The threshold may only move inward while every window so far passes. A split
+    # after sample k is judged by the window centred on it: half of that window lies
+    # past the split, which keeps the threshold clear of the gray zone.
+    n_ok = len(local_ok) if local_ok.all() else int(np.argmin(local_ok))
+    ks = np.arange(window - 1, window - 1 + n_ok) - window // 2
+    ks = ks[ks >= window - 1]
+    ks = ks[ks < n - 1]
+    # A split after sample k is only possible where the value changes
+    ks = ks[v[ks] != v[ks + 1]]
+    if len(ks) == 0:
+        return None, 0
+    k = ks[-1]
+    return float((v[k] + v[k + 1]) / 2), k + 1
+
+def fit_confidence_gate(values, y, min_precision=GATE_MIN_PRECISION, min_samples=GATE_MIN_SAMPLES):
+    """
+    Find thresholds on one scalar feature that decide the class on their own
+    
+    Below lo the samples are fist (0) and above hi they are palm (1); a window
+    of min_samples samples centred on each threshold still reaches min_precision.
+    Only values in between need the full model. Confidences are filled in
+    by check_confidence_gate on held-out data.
+    
+    Args:
+        values: Scalar feature per sample (e.g. average fingertip distance)
+        y: Label vector (0=fist, 1=palm)
+        min_precision: Required fraction of correct labels near each threshold
+        min_samples: Window size, and the fewest samples on a gated side
+    
+    Returns:
+        dict: Gate parameters ('lo'/'hi' are None when that side has no gate)
+    """
+    order = np.argsort(values, kind='stable')
+    v = values[order]
+    is_fist = y[order] == 0
+    
+    lo, n_lo = _gate_side(v, is_fist, min_precision, min_samples)
+    hi, n_hi = _gate_side(v[::-1], ~is_fist[::-1], min_precision, min_samples)
+    
+    # The two gated ranges must not overlap
+    if lo is not None and hi is not None and lo >= hi:
+        lo = hi = None
+    
+    return {"feature_index": AVG_TIP_DIST_INDEX, "lo": lo, "hi": hi}
+
+def check_confidence_gate(gate, values, y, min_precision=GATE_MIN_PRECISION,
+                          min_samples=GATE_MIN_TEST_SAMPLES):
+    """
+    Measure each gated side on held-out data and drop sides that fall short
+    
+    Args:
+        gate: Result of fit_confidence_gate
+        values: Scalar feature per held-out sample
+        y: Held-out labels (0=fist, 1=palm)
+        min_precision: Required held-out precision per side
+        min_samples: Fewest held-out samples a side must be measured on
+    
+    Returns:
+        dict: Gate for model_metadata.json, with the measured precision of each
+              kept side as 'lo_confidence'/'hi_confidence' and the held-out
+              fraction of samples it skips as 'coverage'
+    """
+    checked = {"feature_index": gate["feature_index"], "lo": None, "lo_confidence": None,
+               "hi": None, "hi_confidence": None, "coverage": 0.0}
+    covered = 0
+    for side, label, mask in (("lo", 0, values < (gate["lo"] if gate["lo"] is not None else -np.inf)),
+                              ("hi", 1, values > (gate["hi"] if gate["hi"] is not None else np.inf))):
+        count = int(mask.sum())
+        if count == 0:
+            continue
+        precision = float(np.mean(y[mask] == label))
+        if count < min_samples or precision < min_precision:
+            print(f"⚠ Gate side '{side}' dropped (held-out precision {precision:.4f} on {count} samples)")
+            continue
+        checked[side] = gate[side]
+        checked[f"{side}_confidence"] = precision
+        covered += count
+    checked["coverage"] = float(covered / len(values)) if len(values) else 0.0
+    return checked
+
+def _train_model_captured(model_type, X_train, y_train, X_test, y_test):
+    """
+    Build and fit one candidate in a worker process
+    
+    Returns:
+        tuple: (fitted model, held-out accuracy, console output to print in the parent)
+    """
+    buf = io.StringIO()
+    with redirect_stdout(buf):
+        print(f"\nTraining {MODEL_LABELS[model_type]} Classifier...")
+        model = make_model(model_type)
+        accuracy = _fit(model, X_train, y_train, X_test, y_test)
+    return model, accuracy, buf.getvalue()
+
+def export_onnx(model, X, onnx_path):
+    """
+    Export trained model to ONNX so GripClassifier can run it with onnxruntime
+    
+    The ONNX tree ensemble stores split thresholds as float32 (sklearn keeps
+    float64), halving the node data walked per prediction. Since that rounding
+    can flip samples sitting right on a split, the export is checked against
+    the sklearn model on X and discarded if they disagree too often.
+    
+    Args:
+        model: Trained sklearn classifier
+        X: Feature matrix used to check the export
+        onnx_path: Output path (.onnx file)
+    
+    Returns:
+        bool: True if the model was exported
+    """
+    if not _HAS_SKL2ONNX:
+        print("⚠ skl2onnx not installed, skipping ONNX export (pip install skl2onnx onnxruntime)")
+        return False
+    
+    try:
+        # zipmap=False -> probabilities come back as a plain (N, 2) float tensor
+        onnx_model = convert_sklearn(
+            model,
+            initial_types=[('X', FloatTensorType([None, X.shape[1]]))],
+            options={id(model): {'zipmap': False}}
+        )
+        serialized = onnx_model.SerializeToString()
+    except Exception as e:
+        print(f"⚠ ONNX export failed: {e}")
+        return False
+    
+    if _HAS_ONNXRUNTIME:
+        try:
+            sess = ort.InferenceSession(serialized, providers=['CPUExecutionProvider'])
+            onnx_labels = sess.run(None, {'X': X.astype(np.float32, copy=False)})[0]
+        except Exception as e:
+            # e.g. an opset newer than the installed onnxruntime supports
+            print(f"⚠ ONNX export could not be verified, not saving it: {e}")
+            return False
+        agreement = float(np.mean(onnx_labels == model.predict(X)))
+        print(f"  ONNX/sklearn agreement: {agreement:.4%}")
+        if agreement < ONNX_MIN_AGREEMENT:
+            print(f"⚠ ONNX export disagrees with the sklearn model, not saving it")
+            return False
+    else:
+        print("⚠ onnxruntime not installed, ONNX export not verified")
+    
+    with open(onnx_path, 'wb') as f:
+        f.write(serialized)
+    print(f"✓ ONNX model saved to: {onnx_path}")
+    return True
 
 def main():
     """Main training function"""
@@ -258,7 +458,9 @@ def main():
         return
     
     # Load and prepare data
-    X, y = load_data_with_advanced_features(fist_json, palm_json)
+    X, y = load_data_with_advanced_features(
+        fist_json, palm_json, cache_path=fist_data_dir / "landmarks_cache.npz"
+    )
     
     if len(X) == 0:
         print("ERROR: No valid data loaded!")
@@ -269,25 +471,30 @@ def main():
     print("Training Models")
     print("="*60)
     
-    # Try both models and pick the best
-    rf_model = train_model(X, y, model_type='random_forest')
-    svm_model = train_model(X, y, model_type='svm')
-    
-    # Compare and save best model
-    rf_pred = rf_model.predict(X)
-    svm_pred = svm_model.predict(X)
+    # Split once so every candidate is trained and compared on the same held-out set
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
     
-    rf_acc = accuracy_score(y, rf_pred)
-    svm_acc = accuracy_score(y, svm_pred)
+    print(f"\nTraining set: {len(X_train)} samples")
+    print(f"Test set: {len(X_test)} samples")
     
-    if rf_acc >= svm_acc:
-        best_model = rf_model
-        model_name = "random_forest"
-        print(f"\n✓ Random Forest selected (accuracy: {rf_acc:.4f})")
-    else:
-        best_model = svm_model
-        model_name = "svm"
-        print(f"\n✓ SVM selected (accuracy: {svm_acc:.4f})")
+    # Train every candidate at once in separate processes, then print their reports in order
+    results = Parallel(n_jobs=len(MODEL_TYPES), backend='loky')(
+        delayed(_train_model_captured)(model_type, X_train, y_train, X_test, y_test)
+        for model_type in MODEL_TYPES
+    )
+    models = {}
+    accuracies = {}
+    for model_type, (model, accuracy, report) in zip(MODEL_TYPES, results):
+        print(report, end="")
+        models[model_type] = model
+        accuracies[model_type] = accuracy
+    
+    # Compare (held-out accuracy) and save best model
+    model_name = max(MODEL_TYPES, key=lambda m: (accuracies[m], -MODEL_TYPES.index(m)))
+    best_model = models[model_name]
+    print(f"\n✓ {MODEL_LABELS[model_name]} selected (test accuracy: {accuracies[model_name]:.4f})")
     
     # Save model
     model_dir = script_dir / "grip_models"
@@ -297,6 +504,23 @@ def main():
     joblib.dump(best_model, model_path)
     print(f"\n✓ Model saved to: {model_path}")
     
+    # Remove a stale export first so GripClassifier never pairs it with a newer .pkl
+    onnx_path = model_path.with_suffix(".onnx")
+    if onnx_path.exists():
+        onnx_path.unlink()
+    if GripClassifier._linear_params(best_model) is None:
+        export_onnx(best_model, X, onnx_path)
+    else:
+        print("✓ Logistic regression runs as a dot product in GripClassifier, skipping ONNX export")
+    
+    # Scalar gate: frames clearly on one side of it skip the model entirely.
+    # Thresholds come from the training split, confidences from the test split.
+    gate = fit_confidence_gate(X_train[:, AVG_TIP_DIST_INDEX], y_train)
+    gate = check_confidence_gate(gate, X_test[:, AVG_TIP_DIST_INDEX], y_test)
+    print(f"✓ Confidence gate on avg fingertip distance: lo={gate['lo']} ({gate['lo_confidence']}), "
+          f"hi={gate['hi']} ({gate['hi_confidence']}) "
+          f"(skips the model on {gate['coverage']:.1%} of test samples)")
+    
     # Save metadata
     metadata = {
         "model_type": model_name,
@@ -304,13 +528,16 @@ def main():
         "training_samples": len(X),
         "fist_samples": int(np.sum(y == 0)),
         "palm_samples": int(np.sum(y == 1)),
-        "accuracy": float(rf_acc if model_name == "random_forest" else svm_acc)
+        "accuracy": float(accuracies[model_name]),
+        "confidence_gate": gate
     }
     
-    import json as json_lib
     metadata_path = model_dir / "model_metadata.json"
-    with open(metadata_path, 'w') as f:
-        json_lib.dump(metadata, f, indent=2)
+    if _HAS_ORJSON:
+        metadata_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+    else:
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
     print(f"✓ Metadata saved to: {metadata_path}")
     
     print("\n" + "="*60)